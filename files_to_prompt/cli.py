@@ -1,11 +1,20 @@
-import ast
+import collections
+import contextlib
+import fnmatch
+import functools
+import itertools
+import math
+import operator
 import os
+import re
 import sys
-from fnmatch import fnmatch
 
 import click
 
-global_index = 1
+try:
+    import re2
+except ImportError:
+    re2 = None
 
 EXT_TO_LANG = {
     "py": "python",
@@ -24,152 +33,218 @@ EXT_TO_LANG = {
     "rb": "ruby",
 }
 
+# Characters that give a glob more than its literal meaning
+GLOB_CHARS = re.compile(r"[*?[]")
+
+BACKTICK_RUNS = re.compile(r"`{3,}")
+
+# Whether os.path.normcase() changes names, as it does on Windows where it
+# folds case and turns "/" into a backslash. fnmatch.fnmatch() matches
+# through it.
+NORMALIZE_CASE = os.path.normcase("A/") != "A/"
+
 def extract_signatures_and_docstrings(file_path):
     """Extract function signatures and docstrings from a Python file."""
+    # Imported here as they are only needed for --signatures-only
+    import ast
+    import copy
+    import inspect
+    import textwrap
+
+    def get_signature(node):
+        # The def/class line for a node, without decorators or body
+        stub = copy.copy(node)
+        stub.body = []
+        stub.decorator_list = []
+        return ast.unparse(stub)
+
+    def get_docstring(node):
+        # The raw docstring, without ast.get_docstring()'s cleaning pass
+        first = node.body[0] if node.body else None
+        if (
+            isinstance(first, ast.Expr)
+            and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)
+        ):
+            return first.value.value
+        return None
+
+    def iter_definitions(module):
+        # (node, depth) for top-level functions and classes and their methods
+        for node in module.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                yield node, 0
+                if isinstance(node, ast.ClassDef):
+                    for item in node.body:
+                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                            yield item, 1
+
     try:
-        with open(file_path, 'r') as f:
-            source = f.read()
-        
-        # Replace tabs with spaces to normalize indentation
-        source = source.replace('\t', '    ')
-        module = ast.parse(source)
-        source_lines = source.splitlines()
-        
-        # Function to extract the signature from source lines with proper indentation
-        def get_signature(node, parent_indentation=0):
-            line_index = node.lineno - 1  # AST line numbers are 1-based
-            
-            # Find the complete signature (handle multi-line signatures)
-            line = source_lines[line_index]
-            
-            # Get the base indentation level of the first line
-            # Find leading whitespace in the current line
-            current_indentation = len(line) - len(line.lstrip())
-            
-            # For the first line in a method, we'll use the parent_indentation + 4
-            if parent_indentation > 0:
-                first_line = ' ' * parent_indentation + line.lstrip()
-            else:
-                first_line = line
-            
-            signature_lines = [first_line]
-            
-            # Keep adding lines until we find the closing colon
-            while not signature_lines[-1].rstrip().endswith(':'):
-                line_index += 1
-                if line_index >= len(source_lines):
-                    break  # Avoid index errors
-                
-                next_line = source_lines[line_index]
-                
-                # For continuation lines in a method signature, maintain alignment with opening parenthesis
-                if parent_indentation > 0:
-                    # Find the position of the first opening parenthesis in the signature
-                    first_line_stripped = first_line.lstrip()
-                    paren_pos = first_line_stripped.find('(')
-                    if paren_pos != -1:
-                        # Calculate the indentation needed to align with the opening parenthesis
-                        align_pos = parent_indentation + paren_pos + 1  # +1 for the character after '('
-                        next_line_content = next_line.lstrip()
-                        next_line = ' ' * align_pos + next_line_content
-                    else:
-                        # If no opening parenthesis, use consistent indentation
-                        next_line = ' ' * (parent_indentation + 4) + next_line.lstrip()
-                
-                signature_lines.append(next_line)
-            
-            return '\n'.join(signature_lines)
-        
-        # Function to normalize docstring indentation
-        def normalize_docstring(docstring, indentation=0):
-            if not docstring:
-                return None
-                
-            lines = docstring.splitlines()
-            
-            # If only one line, return it with proper indentation
-            if len(lines) == 1:
-                return docstring
-                
-            # For multi-line docstrings, normalize the indentation
-            # First, find the minimum indentation of non-empty lines after the first
-            min_indent = float('inf')
-            for line in lines[1:]:
-                # Skip empty lines
-                if line.strip():
-                    curr_indent = len(line) - len(line.lstrip())
-                    min_indent = min(min_indent, curr_indent)
-            
-            # If no non-empty lines were found, return the original
-            if min_indent == float('inf'):
-                min_indent = 0
-                
-            # Create normalized lines with proper indentation
-            normalized = [lines[0]]  # First line stays as is
-            for line in lines[1:]:
-                if line.strip():  # Non-empty line
-                    # Remove the common indentation and add the desired indentation
-                    normalized.append(' ' * indentation + line[min_indent:])
-                else:  # Empty line
-                    normalized.append('')
-                    
-            return '\n'.join(normalized)
-        
+        source = decode_text(read_bytes(file_path))
+        module = compile(source, file_path, "exec", ast.PyCF_ONLY_AST)
+
         results = []
-        
-        # Process all top-level function and class definitions
-        for node in module.body:
-            if isinstance(node, ast.FunctionDef):
-                # Extract function signature from source
-                signature = get_signature(node)
-                
-                # Get docstring if available
-                docstring = ast.get_docstring(node)
-                if docstring:
-                    docstring = normalize_docstring(docstring, 4)
-                    results.append(f"{signature}\n    \"\"\"{docstring}\"\"\"")
-                else:
-                    results.append(signature)
-            
-            elif isinstance(node, ast.ClassDef):
-                # Extract class signature from source
-                class_sig = get_signature(node)
-                
-                # Get class docstring if available
-                class_docstring = ast.get_docstring(node)
-                if class_docstring:
-                    class_docstring = normalize_docstring(class_docstring, 4)
-                    class_entry = f"{class_sig}\n    \"\"\"{class_docstring}\"\"\""
-                else:
-                    class_entry = class_sig
-                
-                results.append(class_entry)
-                
-                # Process class methods
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        # Extract method signature from source with 4-space indentation
-                        method_sig = get_signature(item, 4)
-                        
-                        # Get method docstring if available
-                        method_docstring = ast.get_docstring(item)
-                        if method_docstring:
-                            method_docstring = normalize_docstring(method_docstring, 8)
-                            results.append(f"{method_sig}\n        \"\"\"{method_docstring}\"\"\"")
-                        else:
-                            results.append(f"{method_sig}")
-        
+        for node, depth in iter_definitions(module):
+            indentation = "    " * depth
+            entry = indentation + get_signature(node)
+
+            docstring = get_docstring(node)
+            if docstring:
+                first_line, newline, rest = inspect.cleandoc(docstring).partition("\n")
+                docstring = first_line + newline + textwrap.indent(rest, indentation + "    ")
+                entry += f'\n{indentation}    """{docstring}"""'
+            results.append(entry)
+
         return "\n\n".join(results)
     except Exception as e:
         return f"Error extracting signatures from {file_path}: {str(e)}"
 
-def should_ignore(path, gitignore_rules):
-    for rule in gitignore_rules:
-        if fnmatch(os.path.basename(path), rule):
+
+def glob_to_regex(glob):
+    """Translate an fnmatch-style glob into an unanchored regular expression.
+
+    Unlike fnmatch.translate() the result uses no lookaheads or atomic groups,
+    so it is also accepted by RE2.
+    """
+    i, n = 0, len(glob)
+    parts = []
+    while i < n:
+        c = glob[i]
+        i += 1
+        if c == "*":
+            # Collapse runs of stars, they mean the same as a single one
+            while i < n and glob[i] == "*":
+                i += 1
+            parts.append(".*")
+        elif c == "?":
+            parts.append(".")
+        elif c == "[":
+            j = i
+            if j < n and glob[j] == "!":
+                j += 1
+            if j < n and glob[j] == "]":
+                j += 1
+            while j < n and glob[j] != "]":
+                j += 1
+            if j >= n:
+                parts.append("\\[")
+                continue
+            chars = glob[i:j].replace("\\", "\\\\")
+            chars = re.sub(r"([&~|])", r"\\\1", chars)
+            i = j + 1
+            if chars[0] == "!":
+                chars = "^" + chars[1:]
+            elif chars[0] in "^[":
+                chars = "\\" + chars
+            parts.append(f"[{chars}]")
+        else:
+            parts.append(re.escape(c))
+    return "".join(parts)
+
+
+class RE2Pattern:
+    """An RE2 pattern that hands names RE2 cannot take to a stdlib ``re`` copy.
+
+    google-re2 encodes every string to UTF-8, which fails for the lone
+    surrogates Python uses for filenames that are not valid UTF-8.
+    """
+
+    def __init__(self, pattern, options):
+        self.pattern = pattern
+        self.compiled = re2.compile(pattern, options)
+        self.fallback = None
+
+    def fullmatch(self, name):
+        try:
+            return self.compiled.fullmatch(name)
+        except UnicodeEncodeError:
+            if self.fallback is None:
+                self.fallback = re.compile(self.pattern)
+            return self.fallback.fullmatch(name)
+
+
+def compile_globs(globs):
+    """Compile a sequence of fnmatch-style globs into one pattern for ``fullmatch``.
+
+    Uses RE2's linear-time matching when google-re2 is installed, and the
+    stdlib ``re`` for globs RE2 rejects.
+    """
+    pattern = "(?s)" + "|".join(f"(?:{glob_to_regex(glob)})" for glob in globs)
+    try:
+        if re2 is not None:
+            options = re2.Options()
+            options.log_errors = False
+            return RE2Pattern(pattern, options)
+        return re.compile(pattern)
+    except (re.error, getattr(re2, "error", re.error)):
+        # Globs such as "[z-a]" that fnmatch tolerates but a regex does not
+        return re.compile("|".join(f"(?:{fnmatch.translate(glob)})" for glob in globs))
+
+
+@functools.lru_cache(maxsize=None)
+def compile_ignore_rules(rules):
+    """Compile a tuple of fnmatch-style rules into a ``match(name)`` function.
+
+    Plain names like ``node_modules`` and rules like ``*.pyc`` are checked
+    with set lookups; only the remaining globs go into a regular expression.
+    Like fnmatch.fnmatch(), rules and names are compared after
+    os.path.normcase().
+    """
+    if NORMALIZE_CASE:
+        rules = tuple(os.path.normcase(rule) for rule in rules)
+    extensions = set()
+    names = set()
+    globs = []
+    for rule in rules:
+        if not GLOB_CHARS.search(rule):
+            names.add(rule)
+        elif rule.startswith("*.") and not GLOB_CHARS.search(rule, 2) and "." not in rule[2:]:
+            extensions.add(rule[2:])
+        else:
+            globs.append(rule)
+    extensions = frozenset(extensions)
+    names = frozenset(names)
+    pattern = compile_globs(globs) if globs else None
+
+    def match(name):
+        if name in names:
             return True
-        if os.path.isdir(path) and fnmatch(os.path.basename(path) + "/", rule):
+        _, dot, extension = name.rpartition(".")
+        if dot and extension in extensions:
             return True
-    return False
+        return pattern is not None and pattern.fullmatch(name) is not None
+
+    if NORMALIZE_CASE:
+        return lambda name: match(os.path.normcase(name))
+    return match
+
+
+def walk_directory(top):
+    """Walk a directory tree top-down, like os.walk, yielding DirEntry lists.
+
+    Yields ``(root, dirs, files)`` where ``dirs`` and ``files`` are lists of
+    os.DirEntry objects. Entries are classified using the file type returned
+    by scandir, so no extra stat calls are needed. As with os.walk, ``dirs``
+    can be modified in place to prune the walk, and symlinked directories are
+    not followed.
+    """
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        dirs = []
+        files = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            dirs.append(entry)
+                    else:
+                        files.append(entry)
+        except OSError:
+            continue
+        yield root, dirs, files
+        stack.extend(entry.path for entry in reversed(dirs))
 
 
 def read_gitignore(path):
@@ -187,60 +262,207 @@ def add_line_numbers(content):
 
     padding = len(str(len(lines)))
 
-    numbered_lines = [f"{i + 1:{padding}}  {line}" for i, line in enumerate(lines)]
-    return "\n".join(numbered_lines)
+    # Build the format once and apply it to (number, line) pairs at C level
+    line_format = "%%%dd  %%s" % padding
+    return "\n".join(map(line_format.__mod__, enumerate(lines, 1)))
 
 
-def print_path(writer, path, content, cxml, markdown, line_numbers):
+def print_path(writer, path, content, cxml, markdown, line_numbers, document_index, lang=""):
     if cxml:
-        print_as_xml(writer, path, content, line_numbers)
+        print_as_xml(writer, path, content, line_numbers, document_index)
     elif markdown:
-        print_as_markdown(writer, path, content, line_numbers)
+        print_as_markdown(writer, path, content, line_numbers, lang)
     else:
         print_default(writer, path, content, line_numbers)
 
 
 def print_default(writer, path, content, line_numbers):
-    writer(path)
-    writer("---")
     if line_numbers:
         content = add_line_numbers(content)
-    writer(content)
-    writer("")
-    writer("---")
+    writer(f"{path}\n---\n{content}\n\n---\n")
 
 
-def print_as_xml(writer, path, content, line_numbers):
-    global global_index
-    writer(f'<document index="{global_index}">')
-    writer(f"<source>{path}</source>")
-    writer("<document_content>")
+def print_as_xml(writer, path, content, line_numbers, document_index):
     if line_numbers:
         content = add_line_numbers(content)
-    writer(content)
-    writer("</document_content>")
-    writer("</document>")
-    global_index += 1
-
-
-def print_as_markdown(writer, path, content, line_numbers):
-    # Extract the file extension for language detection
-    file_path = path
-    if " (signatures only)" in path:
-        file_path = path.split(" (signatures only)")[0]
-        
-    lang = EXT_TO_LANG.get(file_path.split(".")[-1], "")
-    
-    # Figure out how many backticks to use
-    backticks = "```"
-    while backticks in content:
-        backticks += "`"
-    writer(path)
-    writer(f"{backticks}{lang}")
+    writer(
+        f'<document index="{next(document_index)}">\n'
+        f"<source>{path}</source>\n"
+        f"<document_content>\n{content}\n</document_content>\n"
+        "</document>\n"
+    )
+
+
+def print_as_markdown(writer, path, content, line_numbers, lang):
+    # Use a fence one backtick longer than the longest run in the content
+    longest_run = max(map(len, BACKTICK_RUNS.findall(content)), default=0)
+    backticks = "`" * max(3, longest_run + 1)
     if line_numbers:
         content = add_line_numbers(content)
-    writer(content)
-    writer(f"{backticks}")
+    writer(f"{path}\n{backticks}{lang}\n{content}\n{backticks}\n")
+
+
+def print_warning(message):
+    # Flush file contents written so far, so with 2>&1 the warning still
+    # appears after them
+    sys.stdout.flush()
+    # Only style output headed for a terminal
+    if sys.stderr.isatty():
+        click.echo(click.style(message, fg="red"), err=True)
+    else:
+        print(message, file=sys.stderr, flush=True)
+
+
+def read_bytes(path):
+    """Read a whole file using raw os calls, skipping the io module layers."""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size) if size else b""
+        chunk = os.read(fd, 1 << 16)
+        if chunk:
+            # Short read, the file grew, or its size is not reported (procfs)
+            chunks = [data, chunk]
+            while chunk:
+                chunk = os.read(fd, 1 << 16)
+                chunks.append(chunk)
+            data = b"".join(chunks)
+        return data
+    finally:
+        os.close(fd)
+
+
+def decode_text(data):
+    """Decode file bytes as UTF-8 with universal newline translation."""
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def read_file(path, should_extract_signatures):
+    """Read a single file, returning a ``(content, warning_message)`` tuple."""
+    if should_extract_signatures and path.endswith(".py"):
+        return extract_signatures_and_docstrings(path), None
+    data = read_bytes(path)
+    # A NUL byte near the start means a binary file, so skip decoding it
+    if data.find(b"\x00", 0, 4096) != -1:
+        return None, f"Warning: Skipping binary file {path}"
+    try:
+        return decode_text(data), None
+    except UnicodeDecodeError:
+        return None, f"Warning: Skipping file {path} due to UnicodeDecodeError"
+
+
+def read_files(files, signature_count=0):
+    """Read ``(path, should_extract_signatures)`` pairs, yielding results in order.
+
+    Yields ``(path, should_extract_signatures, content, warning_message)``.
+    Reads run on a thread pool so the open/read syscalls for many small files
+    can overlap, but only a bounded window of them is in flight at a time, so
+    memory stays bounded however slowly the results are consumed. Tiny batches
+    are read serially as they are not worth the overhead.
+
+    Signature extraction is CPU-bound, so when ``signature_count`` files need
+    it and there is enough of it to keep more than one worker busy, those
+    files are sent to a process pool instead.
+    """
+    files = iter(files)
+    head = list(itertools.islice(files, 5))
+    if len(head) <= 4:
+        for path, should_extract_signatures in head:
+            yield (path, should_extract_signatures, *read_file(path, should_extract_signatures))
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with contextlib.ExitStack() as stack:
+        process_pool = None
+        # Around 16 files per worker process, to make starting each one pay off
+        process_workers = min(os.cpu_count() or 1, math.ceil(signature_count / 16))
+        if process_workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            process_pool = stack.enter_context(
+                ProcessPoolExecutor(max_workers=process_workers)
+            )
+            # Start the worker processes now, before any reader threads exist
+            process_pool.submit(os.getpid).result()
+
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        thread_pool = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+        window = max_workers * 2
+        pending = collections.deque()
+        for path, should_extract_signatures in itertools.chain(head, files):
+            if process_pool is not None and should_extract_signatures and path.endswith(".py"):
+                pool = process_pool
+            else:
+                pool = thread_pool
+            future = pool.submit(read_file, path, should_extract_signatures)
+            pending.append((path, should_extract_signatures, future))
+            if len(pending) >= window:
+                path, should_extract_signatures, future = pending.popleft()
+                yield (path, should_extract_signatures, *future.result())
+        while pending:
+            path, should_extract_signatures, future = pending.popleft()
+            yield (path, should_extract_signatures, *future.result())
+
+
+def iter_directory_files(
+    path,
+    extensions,
+    include_hidden,
+    ignore_files_only,
+    ignore_gitignore,
+    gitignore_rules,
+    ignore_patterns,
+):
+    """Yield the path of every file to output under a directory, in walk order."""
+    ignore_match = compile_ignore_rules(tuple(ignore_patterns)) if ignore_patterns else None
+    dir_ignore_match = None if ignore_files_only else ignore_match
+    # Maps each directory still to be walked to the (rules, compiled rules)
+    # inherited from its parent, so directories without a .gitignore of
+    # their own reuse the parent's compiled pattern
+    scoped_rules = {path: (tuple(gitignore_rules), None)}
+    gitignore_match = None
+    for root, dirs, files in walk_directory(path):
+        if not ignore_gitignore:
+            rules, gitignore_match = scoped_rules.pop(root)
+            own_rules = read_gitignore(root)
+            if own_rules or gitignore_match is None:
+                rules += tuple(own_rules)
+                gitignore_match = compile_ignore_rules(rules)
+
+        # Prune directories in one pass, before the walk descends into them.
+        # The walk has already classified entries, so gitignore rules ending
+        # in "/" only need checking against directories.
+        dirs[:] = [
+            d
+            for d in dirs
+            if (include_hidden or not d.name.startswith("."))
+            and not (
+                gitignore_match
+                and (gitignore_match(d.name) or gitignore_match(d.name + "/"))
+            )
+            and not (dir_ignore_match and dir_ignore_match(d.name))
+        ]
+        files = [
+            f
+            for f in files
+            if (include_hidden or not f.name.startswith("."))
+            and not (gitignore_match and gitignore_match(f.name))
+            and not (ignore_match and ignore_match(f.name))
+            and (not extensions or f.name.endswith(extensions))
+        ]
+
+        if not ignore_gitignore:
+            for d in dirs:
+                scoped_rules[d.path] = (rules, gitignore_match)
+
+        # files is a fresh list from the filter above, so sort it in place
+        files.sort(key=operator.attrgetter("name"))
+        for file in files:
+            yield file.path
 
 
 def process_path(
@@ -255,83 +477,59 @@ def process_path(
     claude_xml,
     markdown,
     line_numbers=False,
-    signature_patterns=None,
+    signature_re=None,
+    document_index=None,
 ):
-    if signature_patterns is None:
-        signature_patterns = []
-    
+    if document_index is None:
+        document_index = itertools.count(1)
+
     if os.path.isfile(path):
-        try:
-            # Check if this file should have only signatures extracted
-            should_extract_signatures = any(fnmatch(path, pattern) for pattern in signature_patterns)
-            
-            if should_extract_signatures and path.endswith('.py'):
-                content = extract_signatures_and_docstrings(path)
-                print_path(writer, f"{path} (signatures only)", content, claude_xml, markdown, line_numbers)
-            else:
-                if should_extract_signatures and not path.endswith('.py'):
-                    warning_message = f"Warning: Skipping signatures-only extraction for non-Python file {path}"
-                    click.echo(click.style(warning_message, fg="red"), err=True)
-                
-                with open(path, "r") as f:
-                    print_path(writer, path, f.read(), claude_xml, markdown, line_numbers)
-        except UnicodeDecodeError:
-            warning_message = f"Warning: Skipping file {path} due to UnicodeDecodeError"
-            click.echo(click.style(warning_message, fg="red"), err=True)
+        file_paths = [path]
     elif os.path.isdir(path):
-        for root, dirs, files in os.walk(path):
-            if not include_hidden:
-                dirs[:] = [d for d in dirs if not d.startswith(".")]
-                files = [f for f in files if not f.startswith(".")]
-
-            if not ignore_gitignore:
-                gitignore_rules.extend(read_gitignore(root))
-                dirs[:] = [
-                    d
-                    for d in dirs
-                    if not should_ignore(os.path.join(root, d), gitignore_rules)
-                ]
-                files = [
-                    f
-                    for f in files
-                    if not should_ignore(os.path.join(root, f), gitignore_rules)
-                ]
-
-            if ignore_patterns:
-                if not ignore_files_only:
-                    dirs[:] = [
-                        d
-                        for d in dirs
-                        if not any(fnmatch(d, pattern) for pattern in ignore_patterns)
-                    ]
-                files = [
-                    f
-                    for f in files
-                    if not any(fnmatch(f, pattern) for pattern in ignore_patterns)
-                ]
-
-            if extensions:
-                files = [f for f in files if f.endswith(extensions)]
-
-            for file in sorted(files):
-                file_path = os.path.join(root, file)
-                try:
-                    # Check if this file should have only signatures extracted
-                    should_extract_signatures = any(fnmatch(file_path, pattern) for pattern in signature_patterns)
-                    
-                    if should_extract_signatures and file_path.endswith('.py'):
-                        content = extract_signatures_and_docstrings(file_path)
-                        print_path(writer, f"{file_path} (signatures only)", content, claude_xml, markdown, line_numbers)
-                    else:
-                        if should_extract_signatures and not file_path.endswith('.py'):
-                            warning_message = f"Warning: Skipping signatures-only extraction for non-Python file {file_path}"
-                            click.echo(click.style(warning_message, fg="red"), err=True)
-                        
-                        with open(file_path, "r") as f:
-                            print_path(writer, file_path, f.read(), claude_xml, markdown, line_numbers)
-                except UnicodeDecodeError:
-                    warning_message = f"Warning: Skipping file {file_path} due to UnicodeDecodeError"
-                    click.echo(click.style(warning_message, fg="red"), err=True)
+        file_paths = iter_directory_files(
+            path,
+            extensions,
+            include_hidden,
+            ignore_files_only,
+            ignore_gitignore,
+            gitignore_rules,
+            ignore_patterns,
+        )
+    else:
+        return
+
+    files = (
+        # Check if this file should have only signatures extracted
+        (
+            file_path,
+            signature_re is not None
+            and signature_re.fullmatch(os.path.normcase(file_path)) is not None,
+        )
+        for file_path in file_paths
+    )
+    signature_count = 0
+    if signature_re is not None:
+        # Sizing the signature process pool needs the total, so walk up front
+        files = list(files)
+        signature_count = sum(
+            1
+            for file_path, should_extract_signatures in files
+            if should_extract_signatures and file_path.endswith(".py")
+        )
+    for file_path, should_extract_signatures, content, warning_message in read_files(
+        files, signature_count
+    ):
+        if should_extract_signatures and not file_path.endswith(".py"):
+            print_warning(f"Warning: Skipping signatures-only extraction for non-Python file {file_path}")
+        if warning_message is not None:
+            print_warning(warning_message)
+            continue
+        # Language for Markdown fences, from the real path's extension
+        lang = EXT_TO_LANG.get(file_path.rpartition(".")[2], "") if markdown else ""
+        if should_extract_signatures and file_path.endswith(".py"):
+            print_path(writer, f"{file_path} (signatures only)", content, claude_xml, markdown, line_numbers, document_index, lang)
+        else:
+            print_path(writer, file_path, content, claude_xml, markdown, line_numbers, document_index, lang)
 
 
 def read_paths_from_stdin(use_null_separator):
@@ -461,10 +659,6 @@ def cli(
         Contents of file1.py
         ```
     """
-    # Reset global_index for pytest
-    global global_index
-    global_index = 1
-
     # Read paths from stdin if available
     stdin_paths = read_paths_from_stdin(use_null_separator=null)
 
@@ -472,19 +666,33 @@ def cli(
     paths = [*paths, *stdin_paths]
 
     gitignore_rules = []
-    writer = click.echo
+    gitignore_dirs = set()
+    document_index = itertools.count(1)
+    # Normalised like fnmatch.fnmatch() does, so matching follows the platform
+    signature_re = (
+        compile_globs([os.path.normcase(pattern) for pattern in signature_patterns])
+        if signature_patterns
+        else None
+    )
+    # Write through a large buffer rather than calling click.echo per line;
+    # each printer ends its own block with a newline
     fp = None
     if output_file:
-        fp = open(output_file, "w", encoding="utf-8")
-        writer = lambda s: print(s, file=fp)
+        fp = open(output_file, "w", encoding="utf-8", buffering=1 << 20)
+        writer = fp.write
+    else:
+        writer = sys.stdout.write
     
     for path in paths:
         if not os.path.exists(path):
             raise click.BadArgumentUsage(f"Path does not exist: {path}")
         if not ignore_gitignore:
-            gitignore_rules.extend(read_gitignore(os.path.dirname(path)))
+            parent = os.path.dirname(path)
+            if parent not in gitignore_dirs:
+                gitignore_dirs.add(parent)
+                gitignore_rules.extend(read_gitignore(parent))
         if claude_xml and path == paths[0]:
-            writer("<documents>")
+            writer("<documents>\n")
         process_path(
             path,
             extensions,
@@ -497,9 +705,10 @@ def cli(
             claude_xml,
             markdown,
             line_numbers,
-            signature_patterns,
+            signature_re,
+            document_index,
         )
     if claude_xml:
-        writer("</documents>")
+        writer("</documents>\n")
     if fp:
         fp.close()
\ No newline at end of file
@@ -1,10 +1,11 @@
+import fnmatch
 import os
 import pytest
 import re
 
 from click.testing import CliRunner
 
-from files_to_prompt.cli import cli
+from files_to_prompt.cli import cli, read_files
 
 
 def filenames_from_cxml(cxml_string):
@@ -258,6 +259,22 @@ def test_binary_file_warning(tmpdir):
         )
 
 
+def test_binary_file_with_nul_bytes_warning(tmpdir):
+    runner = CliRunner(mix_stderr=False)
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        with open("test_dir/image.png", "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR")
+        with open("test_dir/text_file.txt", "w") as f:
+            f.write("This is a text file")
+
+        result = runner.invoke(cli, ["test_dir"])
+        assert result.exit_code == 0
+        assert "This is a text file" in result.stdout
+        assert "test_dir/image.png" not in result.stdout
+        assert "Warning: Skipping binary file test_dir/image.png" in result.stderr
+
+
 @pytest.mark.parametrize(
     "args", (["test_dir"], ["test_dir/file1.txt", "test_dir/file2.txt"])
 )
@@ -439,3 +456,309 @@ def test_markdown(tmpdir, option):
             "`````\n"
         )
         assert expected.strip() == actual.strip()
+
+
+def test_many_files_output_in_order(tmpdir):
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir/nested")
+        for i in range(20):
+            with open(f"test_dir/file{i:02}.txt", "w") as f:
+                f.write(f"Contents of file{i:02}")
+            with open(f"test_dir/nested/nested{i:02}.txt", "w") as f:
+                f.write(f"Contents of nested{i:02}")
+
+        result = runner.invoke(cli, ["test_dir", "--cxml"])
+        assert result.exit_code == 0
+        sources = re.findall(r"<source>(.*?)</source>", result.output)
+        assert sources == [f"test_dir/file{i:02}.txt" for i in range(20)] + [
+            f"test_dir/nested/nested{i:02}.txt" for i in range(20)
+        ]
+        indexes = re.findall(r'<document index="(\d+)">', result.output)
+        assert indexes == [str(i) for i in range(1, 41)]
+        for i in range(20):
+            assert f"Contents of file{i:02}" in result.output
+
+
+def test_signatures_only(tmpdir):
+    runner = CliRunner(mix_stderr=False)
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        with open("test_dir/module.py", "w") as f:
+            f.write(
+                "import os\n"
+                "\n"
+                "\n"
+                "def top(a, b=1):\n"
+                '    """Top-level function.\n'
+                "\n"
+                "    With more detail.\n"
+                '    """\n'
+                "    return a\n"
+                "\n"
+                "\n"
+                "class Thing:\n"
+                '    """A thing."""\n'
+                "\n"
+                "    def method(self, value):\n"
+                '        """Do the thing."""\n'
+                "        return value\n"
+                "\n"
+                "    async def amethod(self):\n"
+                "        pass\n"
+            )
+        with open("test_dir/notes.txt", "w") as f:
+            f.write("Some notes")
+
+        result = runner.invoke(
+            cli, ["test_dir", "--signatures-only", "*.py", "--signatures-only", "*.txt"]
+        )
+        assert result.exit_code == 0
+        expected = (
+            "test_dir/module.py (signatures only)\n"
+            "---\n"
+            "def top(a, b=1):\n"
+            '    """Top-level function.\n'
+            "\n"
+            '    With more detail."""\n'
+            "\n"
+            "class Thing:\n"
+            '    """A thing."""\n'
+            "\n"
+            "    def method(self, value):\n"
+            '        """Do the thing."""\n'
+            "\n"
+            "    async def amethod(self):\n"
+            "\n"
+            "---\n"
+            "test_dir/notes.txt\n"
+            "---\n"
+            "Some notes\n"
+            "\n"
+            "---\n"
+        )
+        assert result.stdout == expected
+        assert (
+            "Warning: Skipping signatures-only extraction for non-Python file test_dir/notes.txt"
+            in result.stderr
+        )
+
+
+def test_nested_gitignore_is_scoped_to_its_directory(tmpdir):
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        for name in ("a", "b", "c"):
+            os.makedirs(f"test_dir/{name}/deeper")
+            with open(f"test_dir/{name}/shared.txt", "w") as f:
+                f.write(f"Shared in {name}")
+            with open(f"test_dir/{name}/deeper/shared.txt", "w") as f:
+                f.write(f"Deeper shared in {name}")
+        with open("test_dir/.gitignore", "w") as f:
+            f.write("*.log")
+        with open("test_dir/b/.gitignore", "w") as f:
+            f.write("shared.txt")
+        with open("test_dir/c/deeper/debug.log", "w") as f:
+            f.write("Ignored by the top-level .gitignore")
+
+        result = runner.invoke(cli, ["test_dir", "-c"])
+        assert result.exit_code == 0
+        assert filenames_from_cxml(result.output) == {
+            "test_dir/a/shared.txt",
+            "test_dir/a/deeper/shared.txt",
+            "test_dir/c/shared.txt",
+            "test_dir/c/deeper/shared.txt",
+        }
+
+
+def test_signatures_only_many_files(tmpdir):
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        for i in range(20):
+            with open(f"test_dir/file{i:02}.py", "w") as f:
+                f.write(f'def func{i:02}(x):\n    """Docstring {i:02}."""\n    return x\n')
+            with open(f"test_dir/file{i:02}.txt", "w") as f:
+                f.write(f"Notes {i:02}")
+
+        result = runner.invoke(cli, ["test_dir", "--signatures-only", "*.py", "-c"])
+        assert result.exit_code == 0
+        sources = re.findall(r"<source>(.*?)</source>", result.output)
+        expected_sources = []
+        for i in range(20):
+            expected_sources.append(f"test_dir/file{i:02}.py (signatures only)")
+            expected_sources.append(f"test_dir/file{i:02}.txt")
+        assert sources == expected_sources
+        for i in range(20):
+            assert f'def func{i:02}(x):\n    """Docstring {i:02}."""' in result.output
+            assert f"Notes {i:02}" in result.output
+
+
+def test_markdown_signatures_only(tmpdir):
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        with open("test_dir/module.py", "w") as f:
+            f.write("def func(x):\n    return x\n")
+
+        result = runner.invoke(cli, ["test_dir", "--signatures-only", "*.py", "-m"])
+        assert result.exit_code == 0
+        assert result.output == (
+            "test_dir/module.py (signatures only)\n"
+            "```python\n"
+            "def func(x):\n"
+            "```\n"
+        )
+
+
+def test_read_files_bounds_reads_in_flight(monkeypatch):
+    monkeypatch.setattr(
+        "files_to_prompt.cli.read_file", lambda path, flag: (f"Contents of {path}", None)
+    )
+    pulled = []
+
+    def files():
+        for i in range(1000):
+            pulled.append(i)
+            yield f"file{i}.txt", False
+
+    results = read_files(files())
+    assert next(results) == ("file0.txt", False, "Contents of file0.txt", None)
+    # Only a small window of files is read ahead of the consumer
+    assert len(pulled) <= 2 * min(32, (os.cpu_count() or 1) * 4)
+    rest = list(results)
+    assert [path for path, _, _, _ in rest] == [f"file{i}.txt" for i in range(1, 1000)]
+    assert len(pulled) == 1000
+
+
+@pytest.mark.parametrize("count,expected_workers", ((16, []), (20, [2]), (40, [3])))
+def test_signature_process_pool_sized_by_work(tmpdir, monkeypatch, count, expected_workers):
+    import concurrent.futures
+
+    created = []
+
+    class RecordingProcessPoolExecutor(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, max_workers=None, *args, **kwargs):
+            created.append(max_workers)
+            super().__init__(max_workers, *args, **kwargs)
+
+    monkeypatch.setattr(
+        concurrent.futures, "ProcessPoolExecutor", RecordingProcessPoolExecutor
+    )
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        for i in range(count):
+            with open(f"test_dir/module{i:02}.py", "w") as f:
+                f.write(f"def func{i:02}(x):\n    return x\n")
+
+        result = runner.invoke(cli, ["test_dir", "--signatures-only", "*.py"])
+        assert result.exit_code == 0
+        assert result.output.count("(signatures only)") == count
+        assert created == expected_workers
+
+
+def test_ignore_rules_follow_normcase(tmpdir, monkeypatch):
+    # Simulate Windows, where fnmatch folds case through os.path.normcase()
+    import ntpath
+
+    from files_to_prompt import cli as cli_module
+
+    monkeypatch.setattr(os.path, "normcase", ntpath.normcase)
+    monkeypatch.setattr(cli_module, "NORMALIZE_CASE", True)
+    cli_module.compile_ignore_rules.cache_clear()
+    runner = CliRunner()
+    try:
+        with tmpdir.as_cwd():
+            os.makedirs("test_dir/build")
+            with open("test_dir/.gitignore", "w") as f:
+                f.write("*.PYC\nBuild/\nNOTES.txt")
+            with open("test_dir/module.pyc", "w") as f:
+                f.write("Compiled")
+            with open("test_dir/notes.txt", "w") as f:
+                f.write("Notes")
+            with open("test_dir/build/output.txt", "w") as f:
+                f.write("Build output")
+            with open("test_dir/kept.txt", "w") as f:
+                f.write("Kept")
+
+            result = runner.invoke(cli, ["test_dir", "-c", "--ignore", "KEPT.TXT"])
+            assert result.exit_code == 0
+            assert filenames_from_cxml(result.output) == set()
+
+            result = runner.invoke(cli, ["test_dir", "-c"])
+            assert result.exit_code == 0
+            assert filenames_from_cxml(result.output) == {"test_dir/kept.txt"}
+    finally:
+        cli_module.compile_ignore_rules.cache_clear()
+
+
+def test_signatures_only_patterns_follow_normcase(tmpdir, monkeypatch):
+    # Simulate Windows, where fnmatch folds case and treats "/" and "\" alike
+    import ntpath
+
+    monkeypatch.setattr(os.path, "normcase", ntpath.normcase)
+    runner = CliRunner()
+    with tmpdir.as_cwd():
+        os.makedirs("test_dir")
+        with open("test_dir/module.py", "w") as f:
+            f.write("def func(x):\n    return x\n")
+
+        result = runner.invoke(cli, ["test_dir", "--signatures-only", "TEST_DIR\\*.py"])
+        assert result.exit_code == 0
+        assert "test_dir/module.py (signatures only)" in result.output
+        assert "return x" not in result.output
+
+
+class StubRE2:
+    "Stands in for google-re2, which encodes every name to UTF-8 before matching"
+
+    error = re.error
+
+    class Options:
+        log_errors = True
+
+    class Pattern:
+        def __init__(self, pattern):
+            self.compiled = re.compile(pattern)
+
+        def fullmatch(self, text):
+            text.encode("utf-8")
+            return self.compiled.fullmatch(text)
+
+    @classmethod
+    def compile(cls, pattern, options):
+        return cls.Pattern(pattern)
+
+
+def test_re2_matching_non_utf8_filename(monkeypatch):
+    # Filenames that are not valid UTF-8 come through as lone surrogates
+    from files_to_prompt import cli as cli_module
+
+    monkeypatch.setattr(cli_module, "re2", StubRE2)
+    cli_module.compile_ignore_rules.cache_clear()
+    name = os.fsdecode(b"\xff\xfebad.py")
+    try:
+        assert not cli_module.compile_ignore_rules(("zz*q",))(name)
+        assert cli_module.compile_ignore_rules(("*bad.p?",))(name)
+        assert cli_module.compile_globs(["*bad.py"]).fullmatch("test_dir/" + name)
+    finally:
+        cli_module.compile_ignore_rules.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "rule",
+    ["*", "*.py", "test_*", "*_test.*", "?.txt", "file?", "[!x]*", "[]]", "[!]]x", "[a-c]*",
+     "[", "a[b", "[!", "[z-a]", "x[z-a]", "build/", "*/", "?*/", "[^a]*", "a\\b", "*.tar.gz"],
+)
+@pytest.mark.parametrize(
+    "name",
+    ["", "x", "a.py", "b.txt", "file1", "test_a", "a_test.py", "]", "x]", "!x", "a", "[", "a[b",
+     "[!", "build", "build/", "b/", "d/", "x/", "^a", "a\\b", "a.tar.gz", "zebra"],
+)
+def test_glob_matching_follows_fnmatch(rule, name):
+    from files_to_prompt.cli import compile_globs, compile_ignore_rules
+
+    expected = fnmatch.fnmatch(name, rule)
+    assert compile_ignore_rules((rule,))(name) == expected
+    assert (compile_globs([rule]).fullmatch(name) is not None) == expected